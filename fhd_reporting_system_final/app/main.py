@@ -1,7 +1,10 @@
 import os
 import hmac
 import hashlib
+import heapq
 import json
+import shutil
+import threading
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 import datetime as dt
@@ -11,6 +14,7 @@ from fastapi import FastAPI, Request, Form, UploadFile, File, Depends, HTTPExcep
 from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
 from genesys_to_agent_template import run_from_paths
 
@@ -20,10 +24,13 @@ UPLOADS_DIR = BASE_DIR / "uploads"
 REPORTS_DIR = BASE_DIR / "reports"
 
 SECRET_KEY = "change-this-secret-in-production"
+SECRET_BYTES = SECRET_KEY.encode()
 SESSION_COOKIE_NAME = "fhd_session"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
+# Raw SHA-256 digests, compared in constant time at login.
 USERS = {
-    "admin": hashlib.sha256("admin123".encode()).hexdigest()
+    "admin": hashlib.sha256(b"admin123").digest()
 }
 
 app = FastAPI(title="FHD Automated Reporting System")
@@ -32,9 +39,12 @@ app.mount("/static", StaticFiles(directory=str(BASE_DIR / "app" / "static")), na
 templates = Jinja2Templates(directory=str(BASE_DIR / "app" / "templates"))
 
 
+def _signature(value: str) -> str:
+    return hmac.digest(SECRET_BYTES, value.encode(), "sha256").hex()
+
+
 def sign_value(value: str) -> str:
-    sig = hmac.new(SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
-    return f"{value}|{sig}"
+    return f"{value}|{_signature(value)}"
 
 
 def verify_signed_value(signed: str) -> Optional[str]:
@@ -42,18 +52,20 @@ def verify_signed_value(signed: str) -> Optional[str]:
         value, sig = signed.rsplit("|", 1)
     except ValueError:
         return None
-    expected_sig = hmac.new(SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
-    if hmac.compare_digest(sig, expected_sig):
+    if hmac.compare_digest(sig, _signature(value)):
         return value
     return None
 
 
 def get_current_user(request: Request) -> Optional[str]:
-    cookie = request.cookies.get(SESSION_COOKIE_NAME)
-    if not cookie:
-        return None
-    username = verify_signed_value(cookie)
-    return username
+    """
+    Verify the session cookie at most once per request; the result is kept
+    on request.state for any later dependency in the same request.
+    """
+    if not hasattr(request.state, "user"):
+        cookie = request.cookies.get(SESSION_COOKIE_NAME)
+        request.state.user = verify_signed_value(cookie) if cookie else None
+    return request.state.user
 
 
 async def require_user(request: Request) -> str:
@@ -63,21 +75,138 @@ async def require_user(request: Request) -> str:
     return user
 
 
+# One JSON object per line; new reports are appended, never rewritten.
+REPORTS_INDEX_PATH = DATA_DIR / "reports_index.jsonl"
+LEGACY_REPORTS_INDEX_PATH = DATA_DIR / "reports_index.json"
+
+# "stamp" is (st_mtime_ns, st_size): the file only grows, so an append within
+# the same mtime tick still changes the size.
+_INDEX_CACHE: Dict[str, Any] = {"stamp": None, "next_id": 1, "items": []}
+_index_lock = threading.Lock()
+
+
+def _migrate_legacy_index() -> None:
+    """Convert an old reports_index.json (list or {"items": [...]}) to JSON Lines."""
+    try:
+        raw = json.loads(LEGACY_REPORTS_INDEX_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return
+    if isinstance(raw, dict):
+        raw = raw.get("items", [])
+    # Anything other than a list of report objects (e.g. null) migrates as empty.
+    items = [item for item in raw if isinstance(item, dict)] if isinstance(raw, list) else []
+    REPORTS_INDEX_PATH.write_text(
+        "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items),
+        encoding="utf-8",
+    )
+    # Keep the old file for reference, but never migrate it twice.
+    LEGACY_REPORTS_INDEX_PATH.replace(LEGACY_REPORTS_INDEX_PATH.with_name("reports_index.json.migrated"))
+
+
+def _index_needs_migration() -> bool:
+    if not LEGACY_REPORTS_INDEX_PATH.exists():
+        return False
+    try:
+        return REPORTS_INDEX_PATH.stat().st_size == 0
+    except FileNotFoundError:
+        return True
+
+
+def _ends_with_newline(path: Path) -> bool:
+    try:
+        with path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    except OSError:
+        # Missing or empty file: nothing to terminate.
+        return True
+
+
+def _refresh_index_cache() -> None:
+    """
+    Re-read the reports index into _INDEX_CACHE if the file changed since
+    the last read. Callers must hold _index_lock.
+    """
+    if _index_needs_migration():
+        _migrate_legacy_index()
+    try:
+        st = REPORTS_INDEX_PATH.stat()
+    except FileNotFoundError:
+        _INDEX_CACHE.update(stamp=None, next_id=1, items=[])
+        return
+    stamp = (st.st_mtime_ns, st.st_size)
+    if stamp == _INDEX_CACHE["stamp"]:
+        return
+    items = []
+    for line in REPORTS_INDEX_PATH.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            # Skip a torn line (e.g. an interrupted append) rather than the whole index.
+            continue
+        if isinstance(item, dict):
+            items.append(item)
+    next_id = max((r.get("id") or 0 for r in items), default=0) + 1
+    _INDEX_CACHE.update(stamp=stamp, next_id=next_id, items=items)
+
+
 def load_reports_index() -> list:
+    """
+    Return the reports list, re-reading the index file only when its
+    modification time or size changed since the last read.
+    """
+    with _index_lock:
+        _refresh_index_cache()
+        return list(_INDEX_CACHE["items"])
+
+
+def add_report(entry: Dict[str, Any]) -> list:
+    """
+    Assign the next report id to entry and append it to the index as one
+    JSON line. Runs under one lock, so concurrent uploads never share an
+    id. Returns the updated reports list.
+    """
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    index_path = DATA_DIR / "reports_index.json"
-    if not index_path.exists():
-        return []
+    with _index_lock:
+        _refresh_index_cache()
+        entry["id"] = _INDEX_CACHE["next_id"]
+        # Terminate a torn last line first, so this entry gets a line of its own.
+        prefix = "" if _ends_with_newline(REPORTS_INDEX_PATH) else "\n"
+        with REPORTS_INDEX_PATH.open("a", encoding="utf-8") as f:
+            f.write(prefix + json.dumps(entry, ensure_ascii=False) + "\n")
+        items = _INDEX_CACHE["items"] + [entry]
+        st = REPORTS_INDEX_PATH.stat()
+        _INDEX_CACHE.update(
+            stamp=(st.st_mtime_ns, st.st_size),
+            next_id=entry["id"] + 1,
+            items=items,
+        )
+        return list(items)
+
+
+def load_dashboard_stats() -> Dict[str, Any]:
+    stats_path = DATA_DIR / "dashboard_stats.json"
+    if not stats_path.exists():
+        return {}
     try:
-        return json.loads(index_path.read_text(encoding="utf-8"))
+        return json.loads(stats_path.read_text(encoding="utf-8"))
     except Exception:
-        return []
+        return {}
 
 
-def save_reports_index(items: list) -> None:
+def save_dashboard_stats(stats: Dict[str, Any]) -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    index_path = DATA_DIR / "reports_index.json"
-    index_path.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    stats_path = DATA_DIR / "dashboard_stats.json"
+    stats_path.write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def save_upload(uf: UploadFile, dest: Path) -> None:
+    """Copy an upload to disk in fixed-size chunks, never holding it all in memory."""
+    uf.file.seek(0)
+    with dest.open("wb") as f:
+        shutil.copyfileobj(uf.file, f, UPLOAD_CHUNK_SIZE)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -102,9 +231,8 @@ async def login_submit(
     username: str = Form(...),
     password: str = Form(...)
 ):
-    hashed = hashlib.sha256(password.encode()).hexdigest()
-    stored = USERS.get(username)
-    if not stored or stored != hashed:
+    provided = hashlib.sha256(password.encode()).digest()
+    if not hmac.compare_digest(provided, USERS.get(username, b"")):
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Invalid username or password.", "user": None},
@@ -130,16 +258,10 @@ async def logout():
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request, user: str = Depends(require_user)):
-    reports = load_reports_index()
-    recent_reports = sorted(reports, key=lambda r: r.get("created_at", ""), reverse=True)[:5]
+    reports = await run_in_threadpool(load_reports_index)
+    recent_reports = heapq.nlargest(5, reports, key=lambda r: r.get("created_at", ""))
 
-    stats_path = DATA_DIR / "dashboard_stats.json"
-    stats: Dict[str, Any] = {}
-    if stats_path.exists():
-        try:
-            stats = json.loads(stats_path.read_text(encoding="utf-8"))
-        except Exception:
-            stats = {}
+    stats = await run_in_threadpool(load_dashboard_stats)
 
     return templates.TemplateResponse(
         "dashboard.html",
@@ -158,7 +280,7 @@ async def upload_center(request: Request, user: str = Depends(require_user)):
     Separate page that lists all upload runs with columns-count info
     for Performance/Status/Booking files so you can validate schema changes.
     """
-    reports = load_reports_index()
+    reports = await run_in_threadpool(load_reports_index)
     reports = sorted(reports, key=lambda r: r.get("created_at", ""), reverse=True)
     return templates.TemplateResponse(
         "upload_center.html",
@@ -186,13 +308,12 @@ async def upload_file(
         original = uf.filename
         safe_name = original.replace(" ", "_")
         dest = UPLOADS_DIR / safe_name
-        with dest.open("wb") as f:
-            f.write(await uf.read())
+        await run_in_threadpool(save_upload, uf, dest)
 
         # Try to detect number of columns for this CSV
         col_count: Optional[int] = None
         try:
-            df_sample = pd.read_csv(dest, nrows=1)
+            df_sample = await run_in_threadpool(pd.read_csv, dest, nrows=1)
             col_count = len(df_sample.columns)
         except Exception:
             col_count = None
@@ -255,7 +376,9 @@ async def upload_file(
 
     # Generate report (uses Genesys + Booking to fill your template)
     try:
-        run_from_paths(perf_path, status_path, template_path, out_xlsx, out_csv, booking=booking_path)
+        report_df = await run_in_threadpool(
+            run_from_paths, perf_path, status_path, template_path, out_xlsx, out_csv, booking=booking_path
+        )
     except Exception as e:
         return templates.TemplateResponse(
             "upload_error.html",
@@ -290,9 +413,8 @@ async def upload_file(
         )
 
     # Update reports index
-    reports = load_reports_index()
     report_entry = {
-        "id": len(reports) + 1,
+        "id": None,
         "date": today_str,
         "original_file": ", ".join([f["original"] for f in saved_files]),
         "stored_file": ", ".join([str(f["path"].name) for f in saved_files]),
@@ -306,33 +428,30 @@ async def upload_file(
         "columns_booking": booking_cols,
         "files_meta": files_meta,
     }
-    reports.append(report_entry)
-    save_reports_index(reports)
+    reports = await run_in_threadpool(add_report, report_entry)
 
     # Refresh dashboard stats
     stats: Dict[str, Any] = {}
     try:
-        df_stats = pd.read_csv(out_csv)
         stats["total_reports"] = len(reports)
         stats["last_report_date"] = today_str
-        if "Agent Name" in df_stats.columns:
-            stats["total_agents"] = int(df_stats["Agent Name"].nunique())
-        if "Total Answered Calls" in df_stats.columns:
-            stats["total_answered"] = int(df_stats["Total Answered Calls"].sum())
-        if "Outbound Calls" in df_stats.columns:
-            stats["total_outbound"] = int(df_stats["Outbound Calls"].sum())
-        if "Total Inbound Booking" in df_stats.columns:
-            stats["total_bookings"] = int(df_stats["Total Inbound Booking"].sum())
-        if "Avg Handle Time sec" in df_stats.columns and df_stats["Avg Handle Time sec"].notna().any():
-            aht_sec = float(df_stats["Avg Handle Time sec"].mean())
+        if "Agent Name" in report_df.columns:
+            stats["total_agents"] = int(report_df["Agent Name"].nunique())
+        if "Total Answered Calls" in report_df.columns:
+            stats["total_answered"] = int(report_df["Total Answered Calls"].sum())
+        if "Outbound Calls" in report_df.columns:
+            stats["total_outbound"] = int(report_df["Outbound Calls"].sum())
+        if "Total Inbound Booking" in report_df.columns:
+            stats["total_bookings"] = int(report_df["Total Inbound Booking"].sum())
+        if "Avg Handle Time sec" in report_df.columns and report_df["Avg Handle Time sec"].notna().any():
+            aht_sec = float(report_df["Avg Handle Time sec"].mean())
             stats["avg_aht_sec"] = round(aht_sec, 1)
             stats["avg_aht_min"] = round(aht_sec / 60.0, 1)
     except Exception:
         stats.setdefault("total_reports", len(reports))
         stats.setdefault("last_report_date", today_str)
 
-    stats_path = DATA_DIR / "dashboard_stats.json"
-    stats_path.write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+    await run_in_threadpool(save_dashboard_stats, stats)
 
     return templates.TemplateResponse(
         "upload_success.html",
@@ -347,7 +466,7 @@ async def upload_file(
 
 @app.get("/reports", response_class=HTMLResponse)
 async def list_reports(request: Request, user: str = Depends(require_user)):
-    reports = load_reports_index()
+    reports = await run_in_threadpool(load_reports_index)
     reports = sorted(reports, key=lambda r: r.get("created_at", ""), reverse=True)
     return templates.TemplateResponse(
         "reports.html", {"request": request, "user": user, "reports": reports}
@@ -356,7 +475,7 @@ async def list_reports(request: Request, user: str = Depends(require_user)):
 
 @app.get("/reports/{report_id}", response_class=HTMLResponse)
 async def view_report(request: Request, report_id: int, user: str = Depends(require_user)):
-    reports = load_reports_index()
+    reports = await run_in_threadpool(load_reports_index)
     report = next((r for r in reports if r.get("id") == report_id), None)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -372,7 +491,7 @@ async def view_report(request: Request, report_id: int, user: str = Depends(requ
 
 @app.get("/api/reports")
 async def api_reports(user: str = Depends(require_user)) -> Dict[str, Any]:
-    reports = load_reports_index()
+    reports = await run_in_threadpool(load_reports_index)
     return {"count": len(reports), "items": reports}
 
 
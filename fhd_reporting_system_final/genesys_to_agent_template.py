@@ -1,10 +1,28 @@
 import argparse
+import csv
 import datetime as dt
+import functools
+from copy import copy
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 import openpyxl
 import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+
+HEADER_ROWS = 2
+DATA_COLUMNS = 14
+
+# Repeated text keys are grouped and joined on as categoricals (integer codes).
+CATEGORY_COLS = ('Agent Id', 'Agent Name', 'Division Name')
+
+# Template layouts (plain data) keyed by path, reused until the file's mtime changes.
+_TEMPLATE_CACHE: Dict[Path, Tuple[int, dict]] = {}
+
+_BOOKING_NAME_KEYS = ('CC_CLERK_NAME', 'AGENT_NAME', 'AGENT NAME')
+_BOOKING_COUNT_SUBSTR = ('NO_OF_BOOKED_APPT', 'BOOKED')
 
 
 def parse_args() -> argparse.Namespace:
@@ -19,68 +37,89 @@ def parse_args() -> argparse.Namespace:
     return p.parse_args()
 
 
-def parse_interval_date(val: str) -> dt.date:
-    if not isinstance(val, str):
-        return dt.date.today()
-    for fmt in ('%d/%m/%y %H:%M', '%m/%d/%y %H:%M'):
-        try:
-            return dt.datetime.strptime(val, fmt).date()
-        except ValueError:
-            continue
-    return dt.date.today()
+def parse_interval_start(values: pd.Series) -> pd.Series:
+    """
+    Parse a Genesys 'Interval Start' column (dd/mm/yy or mm/dd/yy) in one pass
+    to naive timestamps. Values matching neither format become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # pyarrow reads ISO values (e.g. ...T00:00:00.000Z) as tz-aware; Excel needs naive.
+        if getattr(values.dt, 'tz', None) is not None:
+            return values.dt.tz_convert(None)
+        return values
+    parsed = pd.to_datetime(values, format='%d/%m/%y %H:%M', errors='coerce')
+    return parsed.fillna(pd.to_datetime(values, format='%m/%d/%y %H:%M', errors='coerce'))
 
 
-def seconds_to_excel_time(seconds: Optional[float]) -> Optional[float]:
-    if seconds is None:
-        return None
-    try:
-        s = float(seconds)
-    except (TypeError, ValueError):
-        return None
-    if pd.isna(s):
-        return None
-    return s / 86400.0
+def nan_to_none(values: np.ndarray) -> list:
+    """Convert a float array to a list with None (empty cell/field) for NaN."""
+    return np.where(np.isnan(values), None, values).tolist()
 
 
-def seconds_to_hhmmss_time(seconds: Optional[float]) -> Optional[dt.time]:
-    if seconds is None:
-        return None
+def seconds_to_excel_time(seconds: np.ndarray) -> list:
+    """Convert seconds to Excel day fractions; NaN becomes None (empty cell)."""
+    return nan_to_none(seconds / 86400.0)
+
+
+def seconds_to_hhmmss_time(seconds: np.ndarray) -> list:
+    """Convert seconds to time values clamped to 00:00:00..23:59:59; NaN becomes None."""
+    missing = np.isnan(seconds).tolist()
+    s = np.clip(np.round(np.nan_to_num(seconds)), 0, 86399).astype('int64')
+    h, rem = np.divmod(s, 3600)
+    m, sec = np.divmod(rem, 60)
+    return [None if miss else dt.time(hour=hh, minute=mm, second=ss)
+            for miss, hh, mm, ss in zip(missing, h.tolist(), m.tolist(), sec.tolist())]
+
+
+def read_genesys_csv(path: Path, encoding: str) -> pd.DataFrame:
+    """
+    Read a Genesys export with the multithreaded pyarrow parser, falling back
+    to the default C parser if pyarrow is missing or rejects the file/encoding.
+    """
     try:
-        s = int(round(float(seconds)))
-    except (TypeError, ValueError):
-        return None
-    if s < 0:
-        s = 0
-    h = s // 3600
-    m = (s % 3600) // 60
-    sec = s % 60
-    if h > 23:
-        h, m, sec = 23, 59, 59
-    return dt.time(hour=h, minute=m, second=sec)
+        df = pd.read_csv(path, encoding=encoding, engine='pyarrow')
+    except (ImportError, ValueError):
+        return pd.read_csv(path, encoding=encoding)
+
+    # pyarrow keeps text it cannot decode as raw bytes instead of raising.
+    for col, dtype in df.dtypes.items():
+        if dtype != object:
+            continue
+        first = df[col].first_valid_index()
+        if first is not None and isinstance(df.at[first, col], bytes):
+            return pd.read_csv(path, encoding=encoding)
+    return df
 
 
 def load_perf(perf_csv: Path, encoding: str) -> pd.DataFrame:
-    df = pd.read_csv(perf_csv, encoding=encoding)
+    df = read_genesys_csv(perf_csv, encoding)
     if 'Media Type' in df.columns:
         df = df[df['Media Type'].fillna('') == 'voice']
     return df
 
 
 def load_status(status_csv: Path, encoding: str) -> pd.DataFrame:
-    df = pd.read_csv(status_csv, encoding=encoding)
+    df = read_genesys_csv(status_csv, encoding)
     return df
 
 
 def load_booking(booking_csv: Path) -> pd.DataFrame:
+    # pyarrow has no encoding_errors support, so booking files keep the C parser.
     df = pd.read_csv(booking_csv, encoding='utf-8', encoding_errors='replace')
     return df
 
 
+def as_category(df: pd.DataFrame, cols) -> pd.DataFrame:
+    to_convert = {c: 'category' for c in cols if c in df.columns}
+    return df.astype(to_convert) if to_convert else df
+
+
 def aggregate_perf(df: pd.DataFrame) -> pd.DataFrame:
     group_cols = []
     for col in ['Interval Start', 'Agent Id', 'Agent Name', 'Division Name']:
         if col in df.columns:
             group_cols.append(col)
+    df = as_category(df, CATEGORY_COLS)
 
     agg = {}
     if 'Answered' in df.columns:
@@ -94,7 +133,7 @@ def aggregate_perf(df: pd.DataFrame) -> pd.DataFrame:
     if 'Total Handle' in df.columns:
         agg['Total Handle'] = 'sum'
 
-    grouped = df.groupby(group_cols, dropna=False).agg(agg).reset_index()
+    grouped = df.groupby(group_cols, dropna=False, observed=True, sort=False).agg(agg).reset_index()
     return grouped
 
 
@@ -103,6 +142,7 @@ def aggregate_status(df: pd.DataFrame) -> pd.DataFrame:
     for col in ['Interval Start', 'Agent Id', 'Agent Name', 'Division Name']:
         if col in df.columns:
             group_cols.append(col)
+    df = as_category(df, CATEGORY_COLS)
 
     agg = {}
     for col in ['Logged In']:
@@ -112,34 +152,37 @@ def aggregate_status(df: pd.DataFrame) -> pd.DataFrame:
         if col in df.columns:
             agg[col] = 'first'
 
-    grouped = df.groupby(group_cols, dropna=False).agg(agg).reset_index()
+    grouped = df.groupby(group_cols, dropna=False, observed=True, sort=False).agg(agg).reset_index()
     return grouped
 
 
-def aggregate_booking(df: pd.DataFrame) -> pd.DataFrame:
-    name_col = None
-    for c in df.columns:
-        key = str(c).strip().upper()
-        if key in ('CC_CLERK_NAME', 'AGENT_NAME', 'AGENT NAME'):
-            name_col = c
-            break
+@functools.lru_cache(maxsize=32)
+def _resolve_booking_cols(columns: tuple) -> Tuple[object, object]:
+    """
+    Find the (name, count) columns of a booking header. Booking files arrive
+    daily with the same layout, so results are memoized per header tuple.
+    """
+    norm = {str(c).strip().upper(): c for c in columns}
+
+    name_col = next((norm[k] for k in _BOOKING_NAME_KEYS if k in norm), None)
     if name_col is None:
         raise ValueError('Booking file does not contain CC_CLERK_NAME / AGENT_NAME column')
 
-    count_col = None
-    for c in df.columns:
-        key = str(c).upper()
-        if 'NO_OF_BOOKED_APPT' in key or 'BOOKED' in key:
-            count_col = c
-            break
+    count_col = next((c for k, c in norm.items() if any(s in k for s in _BOOKING_COUNT_SUBSTR)), None)
     if count_col is None:
         raise ValueError('Booking file does not contain NO_OF_BOOKED_APPT-like column')
+    return name_col, count_col
 
-    df2 = df.copy()
-    df2['Agent Name'] = df2[name_col].astype(str)
-    df2['Total Inbound Booking'] = pd.to_numeric(df2[count_col], errors='coerce').fillna(0.0)
 
-    grouped = df2.groupby('Agent Name', dropna=False)['Total Inbound Booking'].sum().reset_index()
+def aggregate_booking(df: pd.DataFrame) -> pd.DataFrame:
+    name_col, count_col = _resolve_booking_cols(tuple(df.columns))
+
+    # Only the two needed columns are materialised; the booking frame is not copied.
+    bookings = pd.DataFrame({
+        'Agent Name': df[name_col].astype(str),
+        'Total Inbound Booking': pd.to_numeric(df[count_col], errors='coerce').fillna(0.0),
+    })
+    grouped = bookings.groupby('Agent Name', dropna=False, sort=False)['Total Inbound Booking'].sum().reset_index()
     return grouped
 
 
@@ -150,109 +193,219 @@ def merge_perf_status(perf_agg: pd.DataFrame, status_agg: pd.DataFrame) -> pd.Da
         join_cols = [c for c in ['Agent Id', 'Agent Name']
                      if c in perf_agg.columns and c in status_agg.columns]
 
-    merged = pd.merge(perf_agg, status_agg, on=join_cols, how='outer', suffixes=('_perf', '_status'))
+    # Both aggregates are unique on their group keys, so align on the index
+    # rather than hashing the key columns again in pd.merge.
+    merged = (
+        perf_agg.set_index(join_cols)
+        .join(status_agg.set_index(join_cols), how='outer', lsuffix='_perf', rsuffix='_status')
+        .reset_index()
+    )
     return merged
 
 
-def fill_template(template_path: Path, df: pd.DataFrame, out_xlsx: Path, out_csv: Path) -> None:
-    wb = openpyxl.load_workbook(template_path, data_only=False)
-    ws = wb['Sheet1']
-
-    max_row = ws.max_row
-    for r in range(3, max_row + 1):
-        for c in range(1, 15):
-            ws.cell(row=r, column=c).value = None
-
-    records = []
-    row_idx = 3
-
-    for _, row in df.iterrows():
-        agent_name = row.get('Agent Name', '')
-        division = row.get('Division Name', '')
-
-        interval_start = row.get('Interval Start')
-        if isinstance(interval_start, str):
-            date_val = parse_interval_date(interval_start)
-        elif isinstance(interval_start, dt.datetime):
-            date_val = interval_start.date()
-        else:
-            date_val = dt.date.today()
-
-        log_in_raw = row.get('Log In')
-        log_out_raw = row.get('Log Out')
-
-        logged_in_seconds = row.get('Logged In')
-        logged_in_duration = seconds_to_excel_time(logged_in_seconds)
-
-        raw_answered = row.get('Answered')
-        answered = 0 if pd.isna(raw_answered) else float(raw_answered)
-
-        raw_outbound = row.get('Outbound')
-        outbound = 0 if pd.isna(raw_outbound) else float(raw_outbound)
-
-        inq_amb = answered
-
-        inbound_booking_val = row.get('Total Inbound Booking', 0)
-        inbound_booking = 0 if pd.isna(inbound_booking_val) else float(inbound_booking_val)
-
-        raw_acw = row.get('Total ACW')
-        total_acw_sec = 0 if pd.isna(raw_acw) else float(raw_acw)
-        total_acw_excel = seconds_to_excel_time(total_acw_sec)
-
-        raw_total_handle = row.get('Total Handle')
-        total_handle_sec = None if pd.isna(raw_total_handle) else float(raw_total_handle)
-
-        if total_handle_sec and answered:
-            avg_handle_sec = float(total_handle_sec) / float(answered)
-        else:
-            raw_avg_handle = row.get('Avg Handle')
-            avg_handle_sec = None if pd.isna(raw_avg_handle) else float(raw_avg_handle)
-
-        avg_handle_time = seconds_to_hhmmss_time(avg_handle_sec)
-
-        ws[f'A{row_idx}'] = dt.datetime.combine(date_val, dt.time(6, 30))
-        ws[f'B{row_idx}'] = agent_name
-        ws[f'C{row_idx}'] = division
-        ws[f'D{row_idx}'] = log_in_raw
-        ws[f'E{row_idx}'] = log_out_raw
-
-        if logged_in_duration is not None:
-            ws[f'F{row_idx}'] = logged_in_duration
-
-        ws[f'G{row_idx}'] = int(answered)
-        ws[f'H{row_idx}'] = int(inq_amb)
-        ws[f'I{row_idx}'] = int(outbound)
-        ws[f'J{row_idx}'] = int(inbound_booking)
-        ws[f'K{row_idx}'] = f"=MAX(0,IFERROR(J{row_idx}/(G{row_idx}-H{row_idx}),0))"
-        ws[f'L{row_idx}'] = f"=G{row_idx}+I{row_idx}"
-
-        if total_acw_excel is not None:
-            ws[f'M{row_idx}'] = total_acw_excel
-        if avg_handle_time is not None:
-            ws[f'N{row_idx}'] = avg_handle_time
-
-        records.append({
-            'Date': date_val.isoformat(),
-            'Agent Name': agent_name,
-            'Division Name': division,
-            'Log in Time': log_in_raw,
-            'Log Out Time': log_out_raw,
-            'Total Logged In Duration (sec)': logged_in_seconds,
-            'Total Answered Calls': answered,
-            'Answered INQ&AMB Queue Calls': inq_amb,
-            'Outbound Calls': outbound,
-            'Total Inbound Booking': inbound_booking,
-            'Total Wrap-Up (ACW) sec': total_acw_sec,
-            'Avg Handle Time sec': avg_handle_sec,
-        })
-
-        row_idx += 1
+def _cell_style(src) -> Optional[dict]:
+    if not src.has_style:
+        return None
+    return {
+        'font': copy(src.font),
+        'fill': copy(src.fill),
+        'border': copy(src.border),
+        'alignment': copy(src.alignment),
+        'protection': copy(src.protection),
+        'number_format': src.number_format,
+    }
+
+
+def _styled_cell(ws, style: Optional[dict], value=None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    if style:
+        for attr, val in style.items():
+            setattr(cell, attr, val)
+    return cell
+
+
+def _read_template(template_path: Path) -> dict:
+    """
+    Parse the template and copy out, as plain data, everything the report
+    sheet reuses: header rows, styles, widths, merged ranges and
+    conditional formats.
+    """
+    tpl_ws = openpyxl.load_workbook(template_path, data_only=False)['Sheet1']
+    return {
+        'title': tpl_ws.title,
+        'show_grid_lines': tpl_ws.sheet_view.showGridLines,
+        'widths': {key: dim.width for key, dim in tpl_ws.column_dimensions.items() if dim.width},
+        'heights': {idx: dim.height for idx, dim in tpl_ws.row_dimensions.items()
+                    if idx <= HEADER_ROWS and dim.height},
+        'merged': [rng.coord for rng in tpl_ws.merged_cells.ranges if rng.max_row <= HEADER_ROWS],
+        'cond_formats': [
+            ([rng.bounds for rng in cf.sqref.ranges], [copy(rule) for rule in cf.rules])
+            for cf in tpl_ws.conditional_formatting
+        ],
+        'header': [[(c.value, _cell_style(c)) for c in row]
+                   for row in tpl_ws.iter_rows(min_row=1, max_row=HEADER_ROWS, max_col=tpl_ws.max_column)],
+        'data_styles': [_cell_style(c) for c in next(tpl_ws.iter_rows(
+            min_row=HEADER_ROWS + 1, max_row=HEADER_ROWS + 1, max_col=DATA_COLUMNS))],
+    }
+
+
+def load_template(template_path: Path) -> dict:
+    """
+    Return the template layout from _read_template, parsing the file only on
+    first use or after it changes on disk. The layout is plain data that
+    report threads only read; no openpyxl worksheet is shared between them.
+    """
+    key = template_path.resolve()
+    mtime = key.stat().st_mtime_ns
+    cached = _TEMPLATE_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    layout = _read_template(key)
+    _TEMPLATE_CACHE[key] = (mtime, layout)
+    return layout
+
+
+def _start_sheet(template_path: Path, n_rows: int):
+    """
+    Create a write-only workbook holding the template header rows.
+    Conditional formatting on the template data rows is stretched to cover
+    n_rows report rows. Returns the workbook, its sheet and one styled cell
+    per data column (taken from the first template data row) to be reused
+    for every row.
+    """
+    layout = load_template(template_path)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(layout['title'])
+    ws.sheet_view.showGridLines = layout['show_grid_lines']
+
+    for key, width in layout['widths'].items():
+        ws.column_dimensions[key].width = width
+    for idx, height in layout['heights'].items():
+        ws.row_dimensions[idx].height = height
+    for coord in layout['merged']:
+        ws.merged_cells.add(coord)
+
+    last_row = HEADER_ROWS + n_rows
+    for bounds, rules in layout['cond_formats']:
+        ranges = []
+        for min_col, min_row, max_col, max_row in bounds:
+            if min_row <= HEADER_ROWS:
+                ranges.append(CellRange(min_col=min_col, min_row=min_row,
+                                        max_col=max_col, max_row=max_row).coord)
+            elif n_rows:
+                ranges.append(CellRange(min_col=min_col, min_row=min_row,
+                                        max_col=max_col, max_row=last_row).coord)
+        if ranges:
+            # Copies, because saving assigns the rules new dxf ids in this workbook.
+            for rule in rules:
+                ws.conditional_formatting.add(' '.join(ranges), copy(rule))
+
+    for row in layout['header']:
+        ws.append([_styled_cell(ws, style, value) for value, style in row])
+
+    row_cells = [_styled_cell(ws, style) for style in layout['data_styles']]
+    return wb, ws, row_cells
+
+
+def fill_template(template_path: Path, df: pd.DataFrame, out_xlsx: Path, out_csv: Path) -> pd.DataFrame:
+    n = len(df)
+    wb, ws, row_cells = _start_sheet(template_path, n)
+
+    def numeric(col: str) -> np.ndarray:
+        if col not in df.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    def raw(col: str, default=None) -> list:
+        if col not in df.columns:
+            return [default] * n
+        values = df[col]
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    # 'Interval Start' stays as read through aggregation so unparseable values
+    # still group apart; it is parsed once here, on the aggregated rows.
+    today = pd.Timestamp.today().normalize()
+    if 'Interval Start' in df.columns:
+        dates = parse_interval_start(df['Interval Start']).fillna(today).dt.normalize()
+    else:
+        dates = pd.Series(today, index=df.index)
+
+    agent_names = raw('Agent Name', '')
+    divisions = raw('Division Name', '')
+    log_ins = raw('Log In')
+    log_outs = raw('Log Out')
+
+    logged_in_sec = numeric('Logged In')
+    answered = np.nan_to_num(numeric('Answered'))
+    outbound = np.nan_to_num(numeric('Outbound'))
+    inq_amb = answered
+    inbound_booking = np.nan_to_num(numeric('Total Inbound Booking'))
+    total_acw_sec = np.nan_to_num(numeric('Total ACW'))
+    total_handle_sec = numeric('Total Handle')
+
+    use_total = ~np.isnan(total_handle_sec) & (total_handle_sec != 0) & (answered != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_handle_sec = np.where(use_total, total_handle_sec / answered, numeric('Avg Handle'))
+
+    logged_in_excel = seconds_to_excel_time(logged_in_sec)
+    total_acw_excel = seconds_to_excel_time(total_acw_sec)
+    avg_handle_times = seconds_to_hhmmss_time(avg_handle_sec)
+    start_times = list((dates + pd.Timedelta(hours=6, minutes=30)).dt.to_pydatetime())
+
+    excel_rows = range(HEADER_ROWS + 1, HEADER_ROWS + 1 + n)
+    booking_pct_formulas = [f"=MAX(0,IFERROR(J{r}/(G{r}-H{r}),0))" for r in excel_rows]
+    total_calls_formulas = [f"=G{r}+I{r}" for r in excel_rows]
+
+    rows = zip(
+        start_times,
+        agent_names,
+        divisions,
+        log_ins,
+        log_outs,
+        logged_in_excel,
+        answered.astype('int64').tolist(),
+        inq_amb.astype('int64').tolist(),
+        outbound.astype('int64').tolist(),
+        inbound_booking.astype('int64').tolist(),
+        booking_pct_formulas,
+        total_calls_formulas,
+        total_acw_excel,
+        avg_handle_times,
+    )
+    for values in rows:
+        # Write-only rows are streamed on append, so the styled cells can be reused.
+        for cell, value in zip(row_cells, values):
+            cell.value = value
+        ws.append(row_cells)
+
+    # One ordered {header: values} mapping backs both the CSV and the returned frame.
+    columns = {
+        'Date': dates.dt.strftime('%Y-%m-%d').tolist(),
+        'Agent Name': agent_names,
+        'Division Name': divisions,
+        'Log in Time': log_ins,
+        'Log Out Time': log_outs,
+        'Total Logged In Duration (sec)': nan_to_none(logged_in_sec),
+        'Total Answered Calls': answered.tolist(),
+        'Answered INQ&AMB Queue Calls': inq_amb.tolist(),
+        'Outbound Calls': outbound.tolist(),
+        'Total Inbound Booking': inbound_booking.tolist(),
+        'Total Wrap-Up (ACW) sec': total_acw_sec.tolist(),
+        'Avg Handle Time sec': nan_to_none(avg_handle_sec),
+    }
 
     out_xlsx.parent.mkdir(parents=True, exist_ok=True)
     wb.save(out_xlsx)
 
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    pd.DataFrame.from_records(records).to_csv(out_csv, index=False, encoding='utf-8-sig')
+    with out_csv.open('w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(columns)
+        writer.writerows(zip(*columns.values()))
+
+    report = pd.DataFrame(columns)
+    return report
 
 
 def run_from_paths(
@@ -263,7 +416,7 @@ def run_from_paths(
     out_csv: Path,
     encoding: str = 'utf-8-sig',
     booking: Optional[Path] = None,
-) -> None:
+) -> pd.DataFrame:
     perf_df = load_perf(perf, encoding)
     status_df = load_status(status, encoding)
     perf_agg = aggregate_perf(perf_df)
@@ -279,7 +432,7 @@ def run_from_paths(
     if 'Agent Name' in merged.columns:
         merged = merged[merged['Agent Name'].notna()]
 
-    fill_template(template, merged, out_xlsx, out_csv)
+    return fill_template(template, merged, out_xlsx, out_csv)
 
 
 def main():
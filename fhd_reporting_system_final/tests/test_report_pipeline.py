@@ -0,0 +1,135 @@
+import csv
+import datetime as dt
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from genesys_to_agent_template import parse_interval_start, run_from_paths
+
+TEMPLATE = Path(__file__).resolve().parents[1] / 'Agent Report Template.xlsx'
+
+PERF_HEADER = ('Interval Start,Interval End,Agent Id,Agent Name,Division Name,Media Type,'
+               'Answered,Outbound,Total ACW,Avg Handle,Total Handle')
+STATUS_HEADER = 'Interval Start,Agent Id,Agent Name,Division Name,Logged In,Log In,Log Out'
+
+
+def write_csv(path: Path, header: str, rows) -> Path:
+    path.write_text('\n'.join([header, *rows]) + '\n', encoding='utf-8-sig')
+    return path
+
+
+def run(tmp_path: Path, perf_rows, status_rows, booking_rows=None):
+    perf = write_csv(tmp_path / 'perf.csv', PERF_HEADER, perf_rows)
+    status = write_csv(tmp_path / 'status.csv', STATUS_HEADER, status_rows)
+    booking = None
+    if booking_rows is not None:
+        booking = tmp_path / 'booking.csv'
+        booking.write_text('\n'.join(['CC_CLERK_NAME,NO_OF_BOOKED_APPT', *booking_rows]) + '\n',
+                           encoding='utf-8')
+    out_xlsx = tmp_path / 'out' / 'report.xlsx'
+    out_csv = tmp_path / 'out' / 'report.csv'
+    report = run_from_paths(perf, status, TEMPLATE, out_xlsx, out_csv, booking=booking)
+    return report, out_xlsx, out_csv
+
+
+def read_csv_rows(path: Path) -> dict:
+    with path.open(encoding='utf-8-sig', newline='') as f:
+        return {(row['Date'], row['Agent Name']): row for row in csv.DictReader(f)}
+
+
+def read_xlsx_rows(path: Path) -> dict:
+    ws = openpyxl.load_workbook(path)['Sheet1']
+    return {(row[0].value.date().isoformat(), row[1].value): row
+            for row in ws.iter_rows(min_row=3)}
+
+
+def test_multi_day_report(tmp_path):
+    report, out_xlsx, out_csv = run(
+        tmp_path,
+        [
+            '12/02/25 00:00,x,a1,Zed Agent,Dubai,voice,10,2,120,,600',
+            '12/02/25 00:00,x,a1,Zed Agent,Dubai,voice,5,1,60,,300',
+            '12/02/25 00:00,x,a1,Zed Agent,Dubai,email,99,0,0,,0',
+            '13/02/25 00:00,x,a1,Zed Agent,Dubai,voice,7,0,,90,',
+            '12/02/25 00:00,x,a2,Amy Agent,Dubai,voice,4,3,30,45.5,',
+        ],
+        [
+            '12/02/25 00:00,a1,Zed Agent,Dubai,3600,08:00:00,17:00:00',
+            '13/02/25 00:00,a1,Zed Agent,Dubai,1800,09:00:00,12:00:00',
+            '12/02/25 00:00,a2,Amy Agent,Dubai,7200,08:30:00,16:30:00',
+        ],
+        ['Zed Agent,3', 'Zed Agent,2', 'Amy Agent,1'],
+    )
+    assert len(report) == 3
+
+    rows = read_csv_rows(out_csv)
+    assert set(rows) == {('2025-02-12', 'Zed Agent'), ('2025-02-13', 'Zed Agent'),
+                         ('2025-02-12', 'Amy Agent')}
+    zed = rows[('2025-02-12', 'Zed Agent')]
+    assert zed['Division Name'] == 'Dubai'
+    assert (zed['Log in Time'], zed['Log Out Time']) == ('08:00:00', '17:00:00')
+    assert float(zed['Total Logged In Duration (sec)']) == 3600
+    assert float(zed['Total Answered Calls']) == 15
+    assert float(zed['Outbound Calls']) == 3
+    assert float(zed['Total Inbound Booking']) == 5
+    assert float(zed['Total Wrap-Up (ACW) sec']) == 180
+    assert float(zed['Avg Handle Time sec']) == 60
+    amy = rows[('2025-02-12', 'Amy Agent')]
+    assert float(amy['Total Answered Calls']) == 4
+    assert float(amy['Total Inbound Booking']) == 1
+    assert float(amy['Avg Handle Time sec']) == 45.5
+    zed_next = rows[('2025-02-13', 'Zed Agent')]
+    assert float(zed_next['Total Answered Calls']) == 7
+    assert float(zed_next['Total Wrap-Up (ACW) sec']) == 0
+    assert float(zed_next['Avg Handle Time sec']) == 90
+
+    cells = read_xlsx_rows(out_xlsx)
+    assert set(cells) == set(rows)
+    zed = cells[('2025-02-12', 'Zed Agent')]
+    r = zed[0].row
+    assert zed[0].value == dt.datetime(2025, 2, 12, 6, 30)
+    assert zed[5].value == dt.time(1, 0)
+    assert [c.value for c in zed[6:10]] == [15, 15, 3, 5]
+    assert zed[10].value == f'=MAX(0,IFERROR(J{r}/(G{r}-H{r}),0))'
+    assert zed[11].value == f'=G{r}+I{r}'
+    assert zed[12].value == pytest.approx(180 / 86400)
+    assert zed[13].value == dt.time(0, 1)
+
+
+def test_unparseable_and_missing_interval_start(tmp_path):
+    today = pd.Timestamp.today().date().isoformat()
+    report, _, out_csv = run(
+        tmp_path,
+        [
+            '2/12/2025 12:00 AM,x,a1,Zed Agent,Dubai,voice,15,0,0,,0',
+            '2/13/2025 12:00 AM,x,a1,Zed Agent,Dubai,voice,7,0,0,,0',
+            ',x,a2,Amy Agent,Dubai,voice,4,0,0,,0',
+        ],
+        ['2/12/2025 12:00 AM,a1,Zed Agent,Dubai,3600,08:00:00,17:00:00'],
+    )
+    assert (report['Date'] == today).all()
+    with out_csv.open(encoding='utf-8-sig', newline='') as f:
+        answered = sorted((row['Agent Name'], float(row['Total Answered Calls']))
+                          for row in csv.DictReader(f))
+    assert answered == [('Amy Agent', 4.0), ('Zed Agent', 7.0), ('Zed Agent', 15.0)]
+
+
+def test_iso_interval_start(tmp_path):
+    report, out_xlsx, _ = run(
+        tmp_path,
+        ['2025-02-12T00:00:00.000Z,x,a1,Zed Agent,Dubai,voice,10,1,0,,100'],
+        ['2025-02-12T00:00:00.000Z,a1,Zed Agent,Dubai,3600,08:00:00,17:00:00'],
+    )
+    assert report['Date'].tolist() == ['2025-02-12']
+    assert report['Total Answered Calls'].tolist() == [10.0]
+    assert set(read_xlsx_rows(out_xlsx)) == {('2025-02-12', 'Zed Agent')}
+
+
+def test_parse_interval_start_drops_timezone():
+    values = pd.Series(pd.to_datetime(['2025-02-12T00:00:00Z', None], utc=True))
+    parsed = parse_interval_start(values)
+    assert parsed.dt.tz is None
+    assert parsed.iloc[0] == pd.Timestamp(2025, 2, 12)
+    assert pd.isna(parsed.iloc[1])